@@ -1,34 +1,104 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Text, Tuple
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Text, Tuple
 
+import atexit
+import logging
+import os
+import pickle
+import queue
 import re
 import sqlite3
+import threading
+import time
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # libyaml not available
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import ahocorasick
+except ImportError:  # optional: alias lookup falls back to a linear scan
+    ahocorasick = None
+
+try:
+    import numpy as np
+except ImportError:  # optional: GPA totals fall back to a per-course loop
+    np = None
+
 from rasa_sdk import Action, FormValidationAction, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, EventType
 from rasa_sdk.types import DomainDict
 
+logger = logging.getLogger(__name__)
+
 # -----------------------------
 # Tuition helpers
 # -----------------------------
 
 DB_PATH = Path(__file__).resolve().parent / "tuition.db"
+PRICING_PATH = Path(__file__).resolve().parent / "pricing.yml"
 
 
-def utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+# (whole second, formatted "YYYY-MM-DDTHH:MM:SS") of the last call; replaced as
+# a single tuple so concurrent callers never see a mismatched pair.
+_ISO_SECOND_CACHE: Tuple[int, str] = (-1, "")
 
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
+def utc_now_iso() -> str:
+    # Like datetime.now(timezone.utc).isoformat(), except the microseconds are
+    # always written (isoformat() drops ".000000"). The date/time part is only
+    # re-formatted once per second.
+    global _ISO_SECOND_CACHE
+    secs, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    cached = _ISO_SECOND_CACHE
+    if cached[0] != secs:
+        cached = _ISO_SECOND_CACHE = (secs, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(secs)))
+    return f"{cached[1]}.{micros:06d}+00:00"
+
+
+# Always executed through this same string so sqlite3's statement cache reuses
+# the prepared statement instead of re-parsing the SQL on every insert.
+_INSERT_RUN_SQL = (
+    "INSERT INTO tuition_runs("
+    "user_id, admission_group, faculty, "
+    "general_credits, major_credits, "
+    "general_rate, major_rate, "
+    "total_tuition, created_at"
+    ") VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# tuition_runs columns after user_id
+TuitionRun = Tuple[str, str, float, float, float, float, float, str]
+
+_CONN: Optional[sqlite3.Connection] = None
+_CONN_LOCK = threading.Lock()
+
+
+def _get_shared_conn() -> sqlite3.Connection:
+    # One connection per process, opened lazily. Callers must hold _CONN_LOCK
+    # while using it.
+    global _CONN
+    if _CONN is None:
+        conn = sqlite3.connect(
+            DB_PATH,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+        ensure_tables(conn)
+        _CONN = conn
+    return _CONN
 
 
 def ensure_tables(conn: sqlite3.Connection) -> None:
@@ -57,8 +127,37 @@ def ensure_tables(conn: sqlite3.Connection) -> None:
     )
 
 
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # The shared connection runs in autocommit mode, so group statements explicitly.
+    conn.execute("BEGIN")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        # A failed COMMIT (e.g. SQLITE_BUSY) can leave the transaction open;
+        # roll back so the next BEGIN on the shared connection still works.
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+# RETURNING needs SQLite 3.35+; the no-op DO UPDATE makes it return the id of an
+# existing user too.
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
 def ensure_user(conn: sqlite3.Connection, sender_id: str) -> int:
     now = utc_now_iso()
+    if _HAS_RETURNING:
+        row = conn.execute(
+            "INSERT INTO users(sender_id, created_at) VALUES(?, ?) "
+            "ON CONFLICT(sender_id) DO UPDATE SET sender_id = sender_id "
+            "RETURNING id",
+            (sender_id, now),
+        ).fetchone()
+        return int(row[0])
+
     conn.execute(
         "INSERT OR IGNORE INTO users(sender_id, created_at) VALUES(?, ?)",
         (sender_id, now),
@@ -70,18 +169,207 @@ def ensure_user(conn: sqlite3.Connection, sender_id: str) -> int:
     return int(row[0])
 
 
-def _load_pricing() -> Dict[str, Any]:
-    pricing_path = Path(__file__).resolve().parent / "pricing.yml"
-    with pricing_path.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+def record_tuition_runs(runs: List[Tuple[str, TuitionRun]]) -> None:
+    # All rows share one transaction, so a batch costs a single commit.
+    with _CONN_LOCK:
+        with _transaction(_get_shared_conn()) as conn:
+            user_ids: Dict[str, int] = {}
+            rows = []
+            for sender_id, run in runs:
+                user_id = user_ids.get(sender_id)
+                if user_id is None:
+                    user_id = user_ids[sender_id] = ensure_user(conn, sender_id)
+                rows.append((user_id, *run))
+            if len(rows) == 1:
+                conn.execute(_INSERT_RUN_SQL, rows[0])
+            else:
+                conn.executemany(_INSERT_RUN_SQL, rows)
+
+
+# Tuition runs are analytics only, so they are written by a background thread
+# instead of blocking the reply. If the writer falls behind, the oldest pending
+# rows are dropped. Rows still queued at interpreter exit are flushed by
+# _flush_tuition_runs(); None on the queue tells the writer to stop.
+_INSERT_QUEUE_MAX = 1024
+_INSERT_BATCH_MAX = 64
+_INSERT_FLUSH_TIMEOUT = 5.0
+_INSERT_QUEUE: "queue.Queue[Optional[Tuple[str, TuitionRun]]]" = queue.Queue(maxsize=_INSERT_QUEUE_MAX)
+_WRITER: Optional[threading.Thread] = None
+_WRITER_LOCK = threading.Lock()
+# Rows dropped because the queue was full, reported once per stored batch
+# rather than once per row.
+_DROPPED_RUNS = 0
+_DROPPED_LOCK = threading.Lock()
+
+
+def _take_dropped_count() -> int:
+    global _DROPPED_RUNS
+    with _DROPPED_LOCK:
+        dropped, _DROPPED_RUNS = _DROPPED_RUNS, 0
+    return dropped
+
+
+def _store_batch(batch: List[Tuple[str, TuitionRun]]) -> None:
+    try:
+        record_tuition_runs(batch)
+    except Exception:
+        logger.exception("Failed to store %d tuition run(s)", len(batch))
+    dropped = _take_dropped_count()
+    if dropped:
+        logger.warning("Tuition run queue was full, dropped %d oldest row(s)", dropped)
+
+
+def _tuition_writer() -> None:
+    while True:
+        batch: List[Tuple[str, TuitionRun]] = []
+        stop = False
+        item = _INSERT_QUEUE.get()
+        while True:
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+            if len(batch) >= _INSERT_BATCH_MAX:
+                break
+            try:
+                item = _INSERT_QUEUE.get_nowait()
+            except queue.Empty:
+                break
+        if batch:
+            _store_batch(batch)
+        if stop:
+            return
+
+
+def _ensure_tuition_writer() -> None:
+    global _WRITER
+    if _WRITER is not None:
+        return
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            writer = threading.Thread(target=_tuition_writer, name="tuition-writer", daemon=True)
+            writer.start()
+            _WRITER = writer
+
+
+@atexit.register
+def _flush_tuition_runs() -> None:
+    # The writer is a daemon thread, so stop it explicitly and let it finish
+    # what is queued; anything it could not reach is written here.
+    writer = _WRITER
+    if writer is not None and writer.is_alive():
+        try:
+            _INSERT_QUEUE.put(None, timeout=_INSERT_FLUSH_TIMEOUT)
+            writer.join(_INSERT_FLUSH_TIMEOUT)
+        except queue.Full:
+            pass
+
+    pending: List[Tuple[str, TuitionRun]] = []
+    while True:
+        try:
+            item = _INSERT_QUEUE.get_nowait()
+        except queue.Empty:
+            break
+        if item is not None:
+            pending.append(item)
+    for start in range(0, len(pending), _INSERT_BATCH_MAX):
+        _store_batch(pending[start:start + _INSERT_BATCH_MAX])
+
+
+def enqueue_tuition_run(sender_id: str, run: TuitionRun) -> None:
+    global _DROPPED_RUNS
+    _ensure_tuition_writer()
+    while True:
+        try:
+            _INSERT_QUEUE.put_nowait((sender_id, run))
+            return
+        except queue.Full:
+            try:
+                _INSERT_QUEUE.get_nowait()
+            except queue.Empty:
+                continue
+            with _DROPPED_LOCK:
+                _DROPPED_RUNS += 1
+
+
+def _read_yaml(path: Path) -> Any:
+    # A pickled copy next to the YAML skips parsing on cold start. It records
+    # the source's (mtime_ns, size) and is only used on an exact match, so a
+    # deploy that installs an older-dated YAML (tar, cp -p, rsync -t) still
+    # replaces it.
+    cache_path = path.with_suffix(path.suffix + ".pkl")
+    st = path.stat()
+    source_stamp = (st.st_mtime_ns, st.st_size)
+    try:
+        with cache_path.open("rb") as f:
+            cached_stamp, cached_data = pickle.load(f)
+        if cached_stamp == source_stamp:
+            return cached_data
+    except Exception:
+        pass
+
+    with path.open("r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=_YamlLoader)
+
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            pickle.dump((source_stamp, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+    return data
+
+
+@lru_cache(maxsize=1)
+def _cached_load_pricing(mtime: float) -> Dict[str, Any]:
+    # mtime is only the cache key: editing pricing.yml invalidates the entry.
+    return _read_yaml(PRICING_PATH) or {}
+
+
+PricingTable = Dict[str, Dict[str, Tuple[float, float]]]
+
+
+@lru_cache(maxsize=1)
+def _build_pricing_index(mtime: float) -> Tuple[PricingTable, Dict[str, FrozenSet[str]]]:
+    pricing = _cached_load_pricing(mtime)
+    table: PricingTable = {}
+    faculties_by_group: Dict[str, FrozenSet[str]] = {}
+    for group, faculties in pricing.items():
+        if not isinstance(faculties, dict):
+            continue
+        faculties_by_group[group] = frozenset(faculties.keys())
+        rates_by_faculty: Dict[str, Tuple[float, float]] = {}
+        for faculty, rates in faculties.items():
+            # Entries with missing/bad rates stay selectable but are left out of
+            # the table, so the calculation reports them as not found.
+            try:
+                rates_by_faculty[faculty] = (float(rates["general"]), float(rates["major"]))
+            except Exception:
+                continue
+        table[group] = rates_by_faculty
+    return table, faculties_by_group
+
+
+def _get_pricing_table() -> PricingTable:
+    return _build_pricing_index(os.path.getmtime(PRICING_PATH))[0]
+
+
+def _get_faculties_by_group() -> Dict[str, FrozenSet[str]]:
+    return _build_pricing_index(os.path.getmtime(PRICING_PATH))[1]
 
 
 def _to_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if type(value) is float:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
     try:
-        if value is None:
-            return None
-        if isinstance(value, (int, float)):
-            return float(value)
         s = str(value).strip().replace(",", ".")
         return float(s)
     except Exception:
@@ -124,14 +412,13 @@ class ValidateTuitionForm(FormValidationAction):
         tracker: Tracker,
         domain: DomainDict,
     ) -> Dict[Text, Any]:
-        pricing = _load_pricing()
+        faculties_by_group = _get_faculties_by_group()
         group = tracker.get_slot("admission_group")
-        if not group or group not in pricing:
+        if not group or group not in faculties_by_group:
             dispatcher.utter_message(text="Эхлээд элсэлтийн оноо сонгоорой.")
             return {"faculty": None}
 
-        faculties = set(pricing[group].keys())
-        if slot_value in faculties:
+        if slot_value in faculties_by_group[group]:
             return {"faculty": slot_value}
 
         dispatcher.utter_message(text="Бүрэлдэхүүн/салбараа товч дээр дарж сонгоорой.")
@@ -174,57 +461,33 @@ class ActionCalculateTuition(Action):
         tracker: Tracker,
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
-        pricing = _load_pricing()
+        pricing = _get_pricing_table()
 
-        group = tracker.get_slot("admission_group")
-        faculty = tracker.get_slot("faculty")
-        gen_cr = _to_float(tracker.get_slot("general_credits")) or 0.0
-        maj_cr = _to_float(tracker.get_slot("major_credits")) or 0.0
+        slots = tracker.slots
+        group = slots.get("admission_group")
+        faculty = slots.get("faculty")
+        # The validators already stored floats, which _to_float returns as-is;
+        # anything unvalidated still falls back to 0 instead of raising.
+        gen_cr = _to_float(slots.get("general_credits")) or 0.0
+        maj_cr = _to_float(slots.get("major_credits")) or 0.0
 
         if not group or not faculty:
             dispatcher.utter_message(text="Мэдээлэл дутуу байна. Дахиад 'төлбөр бодоорой' гэж эхлүүлнэ үү.")
             return []
 
         try:
-            rates = pricing[group][faculty]
-            gen_rate = float(rates["general"])
-            maj_rate = float(rates["major"])
-        except Exception:
+            gen_rate, maj_rate = pricing[group][faculty]
+        except (KeyError, TypeError):
             dispatcher.utter_message(text="Уучлаарай, сонгосон өгөгдлийн үнэ хүснэгтээс олдсонгүй.")
             return []
 
         total = gen_cr * gen_rate + maj_cr * maj_rate
 
         sender_id = tracker.sender_id
-        try:
-            with get_conn() as conn:
-                ensure_tables(conn)
-                user_id = ensure_user(conn, sender_id)
-                conn.execute(
-                    """
-                    INSERT INTO tuition_runs(
-                        user_id, admission_group, faculty,
-                        general_credits, major_credits,
-                        general_rate, major_rate,
-                        total_tuition, created_at
-                    )
-                    VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        user_id,
-                        str(group),
-                        str(faculty),
-                        float(gen_cr),
-                        float(maj_cr),
-                        float(gen_rate),
-                        float(maj_rate),
-                        float(total),
-                        utc_now_iso(),
-                    ),
-                )
-                conn.commit()
-        except Exception as e:
-            dispatcher.utter_message(text=f"(DB хадгалалт амжилтгүй: {e})")
+        enqueue_tuition_run(
+            sender_id,
+            (group, faculty, gen_cr, maj_cr, gen_rate, maj_rate, total, utc_now_iso()),
+        )
 
         def fmt(n: float) -> str:
             return f"{int(round(n)):,}"
@@ -249,100 +512,43 @@ class ActionCalculateTuition(Action):
         return []
 
 
-class ActionSetAdmissionBefore(Action):
-    def name(self) -> Text:
-        return "action_set_admission_group_before_2024_2025"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("admission_group", "before_2024_2025")]
-
-
-class ActionSetAdmission2024(Action):
-    def name(self) -> Text:
-        return "action_set_admission_group_2024_2025"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("admission_group", "2024_2025")]
-
-
-class ActionSetAdmission2025(Action):
-    def name(self) -> Text:
-        return "action_set_admission_group_2025_2026"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("admission_group", "2025_2026")]
-
-
-class ActionSetFacultyScience(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_science"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "ШИНЖЛЭХ УХААНЫ СУРГУУЛЬ")]
-
-
-class ActionSetFacultyMTEE(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_mtee"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "МЭДЭЭЛЛИЙН ТЕХНОЛОГИ, ЭЛЕКТРОНИКИЙН СУРГУУЛЬ")]
-
-
-class ActionSetFacultyEngineering(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_engineering"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "ИНЖЕНЕР, ТЕХНОЛОГИЙН СУРГУУЛЬ")]
-
-
-class ActionSetFacultyBusiness(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_business"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "БИЗНЕСИЙН СУРГУУЛЬ")]
-
-
-class ActionSetFacultyLaw(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_law"
-
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "ХУУЛЬ ЗҮЙН СУРГУУЛЬ")]
-
-
-class ActionSetFacultyPolitics(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_politics"
+# Button actions that only set a slot, generated from these tables.
+_ADMISSION_GROUP_ACTIONS: Dict[Text, Text] = {
+    "action_set_admission_group_before_2024_2025": "before_2024_2025",
+    "action_set_admission_group_2024_2025": "2024_2025",
+    "action_set_admission_group_2025_2026": "2025_2026",
+}
 
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "УЛС ТӨР СУДЛАЛ, ОЛОН УЛСЫН ХАРИЛЦАА, НИЙТИЙН УДИРДЛАГЫН СУРГУУЛЬ")]
+_FACULTY_ACTIONS: Dict[Text, Text] = {
+    "action_set_faculty_science": "ШИНЖЛЭХ УХААНЫ СУРГУУЛЬ",
+    "action_set_faculty_mtee": "МЭДЭЭЛЛИЙН ТЕХНОЛОГИ, ЭЛЕКТРОНИКИЙН СУРГУУЛЬ",
+    "action_set_faculty_engineering": "ИНЖЕНЕР, ТЕХНОЛОГИЙН СУРГУУЛЬ",
+    "action_set_faculty_business": "БИЗНЕСИЙН СУРГУУЛЬ",
+    "action_set_faculty_law": "ХУУЛЬ ЗҮЙН СУРГУУЛЬ",
+    "action_set_faculty_politics": "УЛС ТӨР СУДЛАЛ, ОЛОН УЛСЫН ХАРИЛЦАА, НИЙТИЙН УДИРДЛАГЫН СУРГУУЛЬ",
+    "action_set_faculty_zavkhan": "ЗАВХАН АЙМАГ ДАХЬ БИЗНЕС, МЭДЭЭЛЛИЙН ТЕХНОЛОГИЙН СУРГУУЛЬ",
+    "action_set_faculty_east": "ЗҮҮН БҮСИЙН СУРГУУЛЬ",
+    "action_set_faculty_west": "БАРУУН БҮСИЙН СУРГУУЛЬ",
+}
 
 
-class ActionSetFacultyZavkhan(Action):
+def _make_slot_setter(action_name: Text, slot: Text, value: Any) -> type:
     def name(self) -> Text:
-        return "action_set_faculty_zavkhan"
+        return action_name
 
     def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "ЗАВХАН АЙМАГ ДАХЬ БИЗНЕС, МЭДЭЭЛЛИЙН ТЕХНОЛОГИЙН СУРГУУЛЬ")]
-
+        return [SlotSet(slot, value)]
 
-class ActionSetFacultyEast(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_east"
+    return type(action_name, (Action,), {"name": name, "run": run})
 
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "ЗҮҮН БҮСИЙН СУРГУУЛЬ")]
 
+for _action_name, _value in _ADMISSION_GROUP_ACTIONS.items():
+    globals()[_action_name] = _make_slot_setter(_action_name, "admission_group", _value)
 
-class ActionSetFacultyWest(Action):
-    def name(self) -> Text:
-        return "action_set_faculty_west"
+for _action_name, _value in _FACULTY_ACTIONS.items():
+    globals()[_action_name] = _make_slot_setter(_action_name, "faculty", _value)
 
-    def run(self, dispatcher, tracker, domain):
-        return [SlotSet("faculty", "БАРУУН БҮСИЙН СУРГУУЛЬ")]
+del _action_name, _value
 
 
 # -----------------------------
@@ -355,8 +561,7 @@ class GradeMap:
     gpa: float
 
 
-def score_to_grade(score: float) -> GradeMap:
-    s = float(score)
+def _score_to_grade_chain(s: float) -> GradeMap:
     if s >= 90:
         return GradeMap("A+", 4.0)
     if 85 <= s <= 89:
@@ -374,6 +579,43 @@ def score_to_grade(score: float) -> GradeMap:
     return GradeMap("F", 0.0)
 
 
+_GRADE_TABLE: List[GradeMap] = [_score_to_grade_chain(s) for s in range(101)]
+
+
+def score_to_grade(score: float) -> GradeMap:
+    # Scores are truncated to whole points, so 89.5 grades as 89 (A-). The
+    # if-chain above left such in-between scores falling through to F.
+    return _GRADE_TABLE[min(100, max(0, int(float(score))))]
+
+
+# Lower bound of each grade band, in ascending order.
+_GRADE_BIN_EDGES = (0, 60, 65, 70, 75, 80, 85, 90)
+_GRADE_BINS: List[GradeMap] = [_GRADE_TABLE[b] for b in _GRADE_BIN_EDGES]
+
+if np is not None:
+    _SCORE_BINS = np.array(_GRADE_BIN_EDGES, dtype=np.float64)
+    _GPA_VALUES = np.array([g.gpa for g in _GRADE_BINS], dtype=np.float64)
+
+
+def grade_courses(courses: List[Dict[str, Any]]) -> Tuple[float, float, List[GradeMap]]:
+    if np is None:
+        grades = [score_to_grade(c["score"]) for c in courses]
+        total_credits = 0.0
+        total_points = 0.0
+        for c, g in zip(courses, grades):
+            cr = float(c["credit"])
+            total_credits += cr
+            total_points += cr * g.gpa
+        return total_credits, total_points, grades
+
+    cr = np.fromiter((c["credit"] for c in courses), dtype=np.float64, count=len(courses))
+    sc = np.fromiter((c["score"] for c in courses), dtype=np.float64, count=len(courses))
+    idx = np.searchsorted(_SCORE_BINS, np.clip(sc, 0, 100), side="right") - 1
+    total_credits = float(cr.sum())
+    total_points = float((cr * _GPA_VALUES[idx]).sum())
+    return total_credits, total_points, [_GRADE_BINS[i] for i in idx.tolist()]
+
+
 class ValidateGpaForm(FormValidationAction):
     def name(self) -> str:
         return "validate_gpa_form"
@@ -433,11 +675,12 @@ class ValidateGpaForm(FormValidationAction):
             dispatcher.utter_message(text="Дүн 0-100 хооронд байх ёстой.")
             return {"current_score": None}
 
-        n = int(tracker.get_slot("number_of_courses") or 0)
-        idx = int(float(tracker.get_slot("current_course_index") or 1))
-        credit = float(tracker.get_slot("current_credit") or 0)
+        slots = tracker.slots
+        n = int(slots.get("number_of_courses") or 0)
+        idx = int(float(slots.get("current_course_index") or 1))
+        credit = float(slots.get("current_credit") or 0)
 
-        courses = tracker.get_slot("courses") or []
+        courses = slots.get("courses") or []
         if not isinstance(courses, list):
             courses = []
 
@@ -491,18 +734,12 @@ class ActionCalculateGpa(Action):
                 SlotSet("courses", []),
             ]
 
-        total_credits = 0.0
-        total_points = 0.0
+        total_credits, total_points, grades = grade_courses(courses)
         lines: List[str] = []
 
-        for i, c in enumerate(courses, start=1):
+        for i, (c, g) in enumerate(zip(courses, grades), start=1):
             cr = float(c["credit"])
             sc = float(c["score"])
-            g = score_to_grade(sc)
-
-            total_credits += cr
-            total_points += cr * g.gpa
-
             lines.append(f"{i}. {cr:g}кр - {sc:g}% → {g.letter} ({g.gpa:.1f})")
 
         gpa = total_points / total_credits if total_credits > 0 else 0.0
@@ -529,25 +766,48 @@ class ActionCalculateGpa(Action):
 # Location helpers
 # -----------------------------
 
-NUM_ONLY_RE = re.compile(r"^\s*(\d{1,2})\s*$")
-BAIR_RE = re.compile(r"^\s*(\d{1,2})\s*[-‐-–—]?\s*р?\s*байр\s*$", re.IGNORECASE)
-BAIR_LOOSE_RE = re.compile(r"(\d{1,2})\s*[-‐-–—]?\s*р?\s*бай[аa]р", re.IGNORECASE)
-
-FORBIDDEN = {
+# One pass over the text: a bare number, a whole "N-р байр" message, or the
+# looser form anywhere in the message. The anchored alternatives come first so
+# they win at position 0.
+NUMBER_RE = re.compile(
+    r"^\s*(?P<plain>\d{1,2})\s*$"
+    r"|^\s*(?P<bair>\d{1,2})\s*[-‐-–—]?\s*р?\s*байр\s*$"
+    r"|(?P<loose>\d{1,2})\s*[-‐-–—]?\s*р?\s*бай[аa]р",
+    re.IGNORECASE,
+)
+
+FORBIDDEN = frozenset({
     ("dorm", 4),
     ("class", 6),
-}
+})
 
 
-def norm(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = s.replace("ё", "е")
-    s = re.sub(r"[“”\"'`]", "", s)
-    s = re.sub(r"[,\.\(\)\[\]\{\}]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
+_NORM_TRANS = str.maketrans({"ё": "е", "“": "", "”": "", '"': "", "'": "", "`": ""})
+_PUNCT_RE = re.compile(r"[,\.\(\)\[\]\{\}]")
+_WS_RE = re.compile(r"\s+")
+
+
+_NORM_CACHE_MAX_LEN = 256
+
+
+def _norm_impl(s: str) -> str:
+    s = (s or "").strip().lower().translate(_NORM_TRANS)
+    s = _PUNCT_RE.sub(" ", s)
+    s = _WS_RE.sub(" ", s).strip()
     return s
 
 
+_norm_cached = lru_cache(maxsize=4096)(_norm_impl)
+
+
+def norm(s: str) -> str:
+    # Only short inputs (button labels, typical utterances) are memoized, so
+    # long free-form messages cannot flush the cache.
+    if s and len(s) > _NORM_CACHE_MAX_LEN:
+        return _norm_impl(s)
+    return _norm_cached(s)
+
+
 def detect_kind(text: str) -> Optional[str]:
     t = norm(text)
     if "дотуур" in t or "dorm" in t:
@@ -558,17 +818,10 @@ def detect_kind(text: str) -> Optional[str]:
 
 
 def extract_number(text: str) -> Optional[int]:
-    t = text.strip()
-    m = NUM_ONLY_RE.match(t)
-    if m:
-        return int(m.group(1))
-    m = BAIR_RE.match(t)
-    if m:
-        return int(m.group(1))
-    m = BAIR_LOOSE_RE.search(t)
-    if m:
-        return int(m.group(1))
-    return None
+    m = NUMBER_RE.search(text.strip())
+    if m is None:
+        return None
+    return int(m.group("plain") or m.group("bair") or m.group("loose"))
 
 
 def is_list_request(text: str) -> bool:
@@ -576,12 +829,22 @@ def is_list_request(text: str) -> bool:
     return t in {"байршлууд", "жагсаалт", "locations", "list", "байршилууд"}
 
 
-def load_places() -> Tuple[Dict[str, Dict[str, Any]], Dict[Tuple[str, int], Dict[str, Any]], List[Dict[str, Any]]]:
+@dataclass
+class PlaceTable:
+    # Parallel per-place columns; the indexes map to positions in them.
+    titles: List[Optional[str]]
+    urls: List[str]
+    alias_index: Dict[str, int]
+    kind_num_index: Dict[Tuple[str, int], int]
+
+
+def load_places() -> PlaceTable:
     path = Path(__file__).resolve().parent / "locations.yml"
-    data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    data = _read_yaml(path)
     raw_places: List[Dict[str, Any]] = data.get("places", []) if isinstance(data, dict) else []
 
-    places: List[Dict[str, Any]] = []
+    table = PlaceTable(titles=[], urls=[], alias_index={}, kind_num_index={})
+
     for p in raw_places:
         if not isinstance(p, dict):
             continue
@@ -589,29 +852,66 @@ def load_places() -> Tuple[Dict[str, Dict[str, Any]], Dict[Tuple[str, int], Dict
         num = p.get("number")
         if isinstance(num, int) and (kind, num) in FORBIDDEN:
             continue
-        places.append(p)
 
-    alias_index: Dict[str, Dict[str, Any]] = {}
-    kind_num_index: Dict[Tuple[str, int], Dict[str, Any]] = {}
-
-    for p in places:
-        aliases = p.get("aliases", []) or []
-        for a in aliases:
-            alias_index[norm(str(a))] = p
-        kind = p.get("kind")
-        num = p.get("number")
+        i = len(table.titles)
+        table.titles.append(p.get("title"))
+        table.urls.append((p.get("url") or "").strip())
+        for a in p.get("aliases", []) or []:
+            table.alias_index[norm(str(a))] = i
         if kind and isinstance(num, int):
-            kind_num_index[(str(kind), num)] = p
+            table.kind_num_index[(kind, num)] = i
 
-    return alias_index, kind_num_index, places
+    return table
 
 
-_ALIAS_INDEX, _KIND_NUM_INDEX, _ALL_PLACES = load_places()
+# locations.yml is parsed on first use, so action server workers that never
+# handle a location question never load it.
+@lru_cache(maxsize=1)
+def _places() -> PlaceTable:
+    return load_places()
 
 
-def say_place(dispatcher: CollectingDispatcher, place: Dict[str, Any]) -> None:
-    title = place.get("title", "Байршил")
-    url = (place.get("url") or "").strip()
+def build_alias_automaton(alias_index: Dict[str, int]) -> Optional[Any]:
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for a_norm, i in alias_index.items():
+        if a_norm:
+            automaton.add_word(a_norm, (len(a_norm), i))
+    if len(automaton) == 0:
+        return None
+    automaton.make_automaton()
+    return automaton
+
+
+@lru_cache(maxsize=1)
+def _alias_automaton() -> Optional[Any]:
+    return build_alias_automaton(_places().alias_index)
+
+
+def find_alias_idx(ntext: str) -> Optional[int]:
+    # The longest alias contained in the text wins, so "хичээлийн 3-р байр"
+    # beats the shorter "3-р байр". Equal-length matches go to the place listed
+    # first in locations.yml, on both the automaton and the fallback path.
+    best_key = (0, 0)
+    best: Optional[int] = None
+    automaton = _alias_automaton()
+    if automaton is not None:
+        for _end, (a_len, i) in automaton.iter(ntext):
+            if (a_len, -i) > best_key:
+                best_key, best = (a_len, -i), i
+        return best
+
+    for a_norm, i in _places().alias_index.items():
+        if (len(a_norm), -i) > best_key and a_norm in ntext:
+            best_key, best = (len(a_norm), -i), i
+    return best
+
+
+def say_place_idx(dispatcher: CollectingDispatcher, i: int) -> None:
+    places = _places()
+    title = places.titles[i] or "Байршил"
+    url = places.urls[i]
     if url:
         dispatcher.utter_message(f"{title}\n{url}")
     else:
@@ -630,11 +930,13 @@ class ActionSendLocation(Action):
         tracker: Tracker,
         domain: Dict[str, Any],
     ) -> List[Dict[str, Any]]:
-        text = (tracker.latest_message.get("text") or "").strip()
-        latest_intent = (tracker.latest_message.get("intent") or {}).get("name")
+        latest = tracker.latest_message
+        text = (latest.get("text") or "").strip()
+        latest_intent = (latest.get("intent") or {}).get("name")
 
-        pending_number = tracker.get_slot("pending_number")
-        place_type = tracker.get_slot("place_type")
+        slots = tracker.slots
+        pending_number = slots.get("pending_number")
+        place_type = slots.get("place_type")
 
         if latest_intent == "choose_place_type" and pending_number:
             chosen_kind = detect_kind(text) or (place_type if place_type in {"class", "dorm"} else None)
@@ -652,9 +954,9 @@ class ActionSendLocation(Action):
                     dispatcher.utter_message("Уучлаарай, тэр байрны мэдээлэл энэ бот дээр байхгүй байна.")
                     return [SlotSet("pending_number", None), SlotSet("place_type", chosen_kind)]
 
-                place = _KIND_NUM_INDEX.get((chosen_kind, num))
-                if place:
-                    say_place(dispatcher, place)
+                i = _places().kind_num_index.get((chosen_kind, num))
+                if i is not None:
+                    say_place_idx(dispatcher, i)
                     return [SlotSet("pending_number", None), SlotSet("place_type", chosen_kind)]
 
             dispatcher.utter_message("Уучлаарай, тэр дугаартай байршил олдсонгүй. Дахиад нэрээр нь бичээд үзээрэй.")
@@ -662,8 +964,7 @@ class ActionSendLocation(Action):
 
         if is_list_request(text):
             lines = ["Боломжтой байршлууд:"]
-            for p in _ALL_PLACES:
-                title = p.get("title")
+            for title in _places().titles:
                 if title:
                     lines.append(f"• {title}")
             dispatcher.utter_message("\n".join(lines))
@@ -672,7 +973,7 @@ class ActionSendLocation(Action):
         kind = detect_kind(text)
         num = extract_number(text)
 
-        if num is not None and kind is None and (NUM_ONLY_RE.match(text) or BAIR_RE.match(text) or BAIR_LOOSE_RE.search(text)):
+        if num is not None and kind is None:
             dispatcher.utter_message(response="utter_ask_place_type")
             return [SlotSet("pending_number", str(num))]
 
@@ -681,9 +982,9 @@ class ActionSendLocation(Action):
                 dispatcher.utter_message("Уучлаарай, тэр байрны мэдээлэл энэ бот дээр байхгүй байна.")
                 return [SlotSet("place_type", kind), SlotSet("pending_number", None)]
 
-            place = _KIND_NUM_INDEX.get((kind, num))
-            if place:
-                say_place(dispatcher, place)
+            i = _places().kind_num_index.get((kind, num))
+            if i is not None:
+                say_place_idx(dispatcher, i)
                 return [SlotSet("place_type", kind), SlotSet("pending_number", None)]
 
             dispatcher.utter_message("Уучлаарай, тэр дугаартай байршил олдсонгүй. Дахиад нэрээр нь бичээд үзээрэй.")
@@ -691,15 +992,12 @@ class ActionSendLocation(Action):
 
         ntext = norm(text)
 
-        place = _ALIAS_INDEX.get(ntext)
-        if place:
-            say_place(dispatcher, place)
+        i = _places().alias_index.get(ntext)
+        if i is None:
+            i = find_alias_idx(ntext)
+        if i is not None:
+            say_place_idx(dispatcher, i)
             return []
 
-        for a_norm, p in _ALIAS_INDEX.items():
-            if a_norm and a_norm in ntext:
-                say_place(dispatcher, p)
-                return []
-
         dispatcher.utter_message("Уучлаарай, тэр байршлыг олсонгүй 😅 “байршлууд” гэж бичээд жагсаалтыг хараарай.")
         return []